@@ -0,0 +1,28 @@
+# firebase_common.py
+# Shared Firestore connection for the firebase_upload / firebase_download scripts.
+# firebase_admin is imported lazily so scripts that only need get_client() never load it.
+import functools
+
+@functools.lru_cache(maxsize=1)
+def get_db(sa_path="Firebase_Key.json"):
+    """Initialize the default Firebase app once and return its (memoized) Firestore client."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(sa_path))
+    return firestore.client()
+
+@functools.lru_cache(maxsize=1)
+def get_async_db(sa_path="Firebase_Key.json"):
+    """Async Firestore client on the same default app (memoized)."""
+    from firebase_admin import firestore_async
+    get_db(sa_path)  # initializes the default app
+    return firestore_async.client()
+
+@functools.lru_cache(maxsize=1)
+def get_client(sa_path="Firebase_Key.json"):
+    """Plain google-cloud-firestore client from the service account, no Firebase app (one-shot scripts)."""
+    from google.cloud import firestore
+    return firestore.Client.from_service_account_json(sa_path)
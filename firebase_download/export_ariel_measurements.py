@@ -1,25 +1,23 @@
 # export_ariel_measurements_compatible.py
 import csv
 import math
+import asyncio
 import argparse
+import itertools
 from datetime import datetime, timezone
-import firebase_admin
-from firebase_admin import credentials, firestore
+import numpy as np
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for firebase_common
+from firebase_common import get_db, get_async_db
 
 # ---------- Defaults ----------
 DEFAULT_COLLECTION = "Data"
 DEFAULT_CENTER_LAT = 32.105
 DEFAULT_CENTER_LON = 35.190
 DEFAULT_RADIUS_KM  = 5.0
-
-# ---------- Firestore connection ----------
-def init_firestore(sa_path="Firebase_Key.json"):
-    cred = credentials.Certificate(sa_path)
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        firebase_admin.initialize_app(cred)
-    return firestore.client()
+PAGE_SIZE = 500
+GEO_BATCH = 4096
 
 # ---------- Compatibility for where/filter between versions ----------
 def add_filter(q, field, op, val):
@@ -29,15 +27,43 @@ def add_filter(q, field, op, val):
     except Exception:
         return q.where(field, op, val)
 
+def select_fields(q, fields):
+    """select() projection; names like RSRP/RSCP are quoted (`RSRP/RSCP`) as single-field paths."""
+    from google.cloud.firestore_v1.field_path import FieldPath
+    return q.select([FieldPath(f).to_api_repr() for f in fields])
+
+# ---------- Paged streaming ----------
+def stream_paged(q, page_size=PAGE_SIZE):
+    """Stream a query in pages of page_size docs using query cursors."""
+    last = None
+    while True:
+        page_q = q.limit(page_size)
+        if last is not None:
+            page_q = page_q.start_after(last)
+        page = list(page_q.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+# ---------- Concurrent shards ----------
+async def _fetch_shard(q):
+    return [d async for d in q.stream()]
+
+def fetch_shards(queries):
+    """Run the queries concurrently on the async client; results in shard order."""
+    async def run():
+        return await asyncio.gather(*(_fetch_shard(q) for q in queries))
+    return list(itertools.chain.from_iterable(asyncio.run(run())))
+
 # ---------- Geography ----------
-def haversine_km(lat1, lon1, lat2, lon2):
+def haversine_km_vec(lat1, lon1, lats, lons):
+    """Distance (km) from one point to arrays of points."""
     R = 6371.0088
-    from math import radians, sin, cos, atan2, sqrt
-    dphi = radians(lat2 - lat1)
-    dlmb = radians(lon2 - lon1)
-    phi1, phi2 = radians(lat1), radians(lat2)
-    a = sin(dphi/2)**2 + cos(phi1)*cos(phi2)*sin(dlmb/2)**2
-    return R * (2*atan2(sqrt(a), sqrt(1-a)))
+    dphi = np.radians(lats - lat1)
+    dlmb = np.radians(lons - lon1)
+    a = np.sin(dphi/2)**2 + math.cos(math.radians(lat1))*np.cos(np.radians(lats))*np.sin(dlmb/2)**2
+    return R * (2*np.arctan2(np.sqrt(a), np.sqrt(1-a)))
 
 def lat_span_deg(radius_km):  # ≈ 1°lat = 110.574 km
     return radius_km / 110.574
@@ -55,17 +81,17 @@ def write_csv(rows, out_path):
     keys = set()
     for r in rows: keys.update(r.keys())
     headers = sorted(keys)
+    # Build the output column by column; only columns holding datetimes get converted
+    cols = []
+    for h in headers:
+        col = [r.get(h, "") for r in rows]
+        if any(isinstance(v, datetime) for v in col):
+            col = [v.astimezone(timezone.utc).isoformat() if isinstance(v, datetime) else v for v in col]
+        cols.append(col)
     with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
-        w.writeheader()
-        for r in rows:
-            cleaned = {}
-            for k, v in r.items():
-                if isinstance(v, datetime):
-                    cleaned[k] = v.astimezone(timezone.utc).isoformat()
-                else:
-                    cleaned[k] = v
-            w.writerow(cleaned)
+        w = csv.writer(f)
+        w.writerow(headers)
+        w.writerows(zip(*cols))
 
 # ---------- Date helpers (optional) ----------
 def try_parse_date(val):
@@ -92,23 +118,64 @@ def main():
     ap.add_argument("--date-start", type=str, default=None, help="YYYY-MM-DD (optional)")
     ap.add_argument("--date-end",   type=str, default=None, help="YYYY-MM-DD (optional)")
     ap.add_argument("--provider",   type=str, default=None, help="exact match on Provider (optional)")
+    ap.add_argument("--lat-num-field", type=str, default=None,
+                    help="numeric mirror of LAT (e.g., LAT_num) for a server-side range filter (optional)")
+    ap.add_argument("--fields",     type=str, default=None,
+                    help="comma-separated fields to download, e.g. DATE,TIME,RSRP (optional; default all)")
+    ap.add_argument("--shards",     type=int, default=1,
+                    help="split the LAT range into N bands fetched concurrently (needs --lat-num-field)")
     args = ap.parse_args()
 
-    db = init_firestore(args.firebase_key)
-
     # Bounding box for lat/lon
-    # No server-side filter for LAT because LAT is string in our data
-    q = db.collection(args.collection)
-    if args.provider:
-        q = add_filter(q, "Provider", "==", args.provider)
-
-    docs = q.stream()  # Client-side filtering for box+radius only
+    dlat = lat_span_deg(args.radius_km)
+    dlon = lon_span_deg(args.center_lat, args.radius_km)
+    lat_min, lat_max = args.center_lat - dlat, args.center_lat + dlat
+    lon_min, lon_max = args.center_lon - dlon, args.center_lon + dlon
+
+    def build_query(db, lat_lo, lat_hi, last_band=True):
+        q = db.collection(args.collection)
+        if args.provider:
+            q = add_filter(q, "Provider", "==", args.provider)
+        # LAT itself is a string in our data, so the range filter needs a numeric mirror field
+        if args.lat_num_field:
+            q = add_filter(q, args.lat_num_field, ">=", lat_lo)
+            q = add_filter(q, args.lat_num_field, "<=" if last_band else "<", lat_hi)
+            q = q.order_by(args.lat_num_field)
+        if args.fields:
+            fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+            fields += ["LAT", "LON", "LNG"] + ([args.date_field] if args.date_field else [])
+            # Paging cursors need the order_by field in every returned snapshot
+            fields += [args.lat_num_field] if args.lat_num_field else []
+            q = select_fields(q, list(dict.fromkeys(fields)))
+        return q
+
+    if args.shards > 1 and args.lat_num_field:
+        # Latitude bands are disjoint, so their concurrent results simply concatenate
+        adb = get_async_db(args.firebase_key)
+        edges = np.linspace(lat_min, lat_max, args.shards + 1).tolist()
+        docs = fetch_shards([build_query(adb, lo, hi, last_band=(i == args.shards - 1))
+                             for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:]))])
+    else:
+        db = get_db(args.firebase_key)
+        docs = stream_paged(build_query(db, lat_min, lat_max))  # Client-side filtering for box+radius
 
     # Client-side filtering by LON, radius, and date (if requested)
     start_dt = datetime.strptime(args.date_start, "%Y-%m-%d").replace(tzinfo=timezone.utc) if args.date_start else None
     end_dt   = datetime.strptime(args.date_end,   "%Y-%m-%d").replace(tzinfo=timezone.utc) if args.date_end   else None
 
     rows = []
+    # Geo filter runs vectorized over batches of GEO_BATCH candidates
+    buffered, lat_list, lon_list = [], [], []
+
+    def flush():
+        if not buffered:
+            return
+        lats = np.array(lat_list); lons = np.array(lon_list)
+        keep = (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+        keep &= haversine_km_vec(args.center_lat, args.center_lon, lats, lons) <= args.radius_km
+        rows.extend(data for data, k in zip(buffered, keep) if k)
+        buffered.clear(); lat_list.clear(); lon_list.clear()
+
     for d in docs:
         data = d.to_dict() or {}
         try:
@@ -122,11 +189,6 @@ def main():
         if lat is None or lon is None:
             continue
 
-        if not (lon_min <= lon <= lon_max):
-            continue
-        if haversine_km(args.center_lat, args.center_lon, lat, lon) > args.radius_km:
-            continue
-
         if (start_dt or end_dt) and args.date_field and args.date_field in data:
             dt = try_parse_date(data[args.date_field])
             if dt:
@@ -134,7 +196,10 @@ def main():
                 if end_dt   and dt > end_dt:   continue
 
         data["_doc_id"] = d.id
-        rows.append(data)
+        buffered.append(data); lat_list.append(lat); lon_list.append(lon)
+        if len(buffered) >= GEO_BATCH:
+            flush()
+    flush()
 
     write_csv(rows, args.out)
     print(f"Exported {len(rows)} rows → {args.out}")
@@ -9,10 +9,22 @@
 import os
 import csv
 import math
+import asyncio
 import argparse
+import itertools
+from datetime import datetime, timedelta
 from typing import List, Tuple
-import firebase_admin
-from firebase_admin import credentials, firestore
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # optional: fall back to the NumPy filter
+    HAVE_NUMBA = False
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for firebase_common
+from firebase_common import get_db, get_async_db
 
 DEFAULT_COLLECTION = "Data"
 
@@ -23,15 +35,23 @@ DEFAULT_RADIUS_KM  = 5.0
 
 DEFAULT_PLMN = "42501"
 
-# ---------------- Firestore init ----------------
-def init_firestore(sa_path):
-    cred = credentials.Certificate(sa_path)
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        firebase_admin.initialize_app(cred)
-    return firestore.client()
-
+PAGE_SIZE = 500
+DOC_ID = "__name__"  # == FieldPath.document_id()
+
+# Fixed CSV schema for --fixed-schema (core G-MoN fields + upload/export extras)
+DATA_FIELDS = [
+    "_doc_id", "userID", "DATE", "TIME", "LAT", "LON", "LNG", "PLMN", "SYSTEM",
+    "xNBID", "LOCAL_CID", "PCI/PSC/BSIC", "ARFCN", "BAND",
+    "RSSI", "RSRP/RSCP", "RSRQ/ECIO", "SNR",
+]
+# All the filters need (doc id aside); --prefilter downloads just these first
+FILTER_FIELDS = ["PLMN", "LAT", "LON", "LNG"]
+GEO_BATCH = 4096
+# Flat-earth distances are within ~1% of haversine at these ranges; only
+# candidates this close (relative) to the radius get the exact check
+RADIUS_TOL = 0.02
+
+# ---------------- Firestore helpers ----------------
 def add_filter(q, field, op, val):
     """Compat for different Firestore client versions."""
     try:
@@ -40,15 +60,85 @@ def add_filter(q, field, op, val):
     except Exception:
         return q.where(field, op, val)
 
+def select_fields(q, fields):
+    """select() projection; names like RSRP/RSCP are quoted (`RSRP/RSCP`) as single-field paths."""
+    from google.cloud.firestore_v1.field_path import FieldPath
+    return q.select([FieldPath(f).to_api_repr() for f in fields])
+
+def stream_paged(q, page_size=PAGE_SIZE):
+    """Stream a query in pages of page_size docs using query cursors."""
+    last = None
+    while True:
+        page_q = q.limit(page_size)
+        if last is not None:
+            page_q = page_q.start_after(last)
+        page = list(page_q.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+async def _fetch(q, sem):
+    async with sem:
+        return [d async for d in q.stream()]
+
+def fetch_concurrent(queries, limit):
+    """Run the queries on the async client, at most limit at a time; results in query order."""
+    async def run():
+        sem = asyncio.Semaphore(limit)
+        return await asyncio.gather(*(_fetch(q, sem) for q in queries))
+    return list(itertools.chain.from_iterable(asyncio.run(run())))
+
+def snap_field(doc, field):
+    """Single field of a DocumentSnapshot without building the full dict; None if missing."""
+    try:
+        return doc.get(field)
+    except KeyError:
+        return None
+
 # ---------------- Geo helpers ----------------
-def haversine_km(lat1, lon1, lat2, lon2):
+def haversine_km_vec(lat1, lon1, lats, lons):
+    """Distance (km) from one point to arrays of points."""
     R = 6371.0088
-    from math import radians, sin, cos, atan2, sqrt
-    dphi = radians(lat2 - lat1)
-    dlmb = radians(lon2 - lon1)
-    phi1, phi2 = radians(lat1), radians(lat2)
-    a = sin(dphi/2)**2 + cos(phi1)*cos(phi2)*sin(dlmb/2)**2
-    return R * (2*atan2(sqrt(a), sqrt(1-a)))
+    dphi = np.radians(lats - lat1)
+    dlmb = np.radians(lons - lon1)
+    a = np.sin(dphi/2)**2 + math.cos(math.radians(lat1))*np.cos(np.radians(lats))*np.sin(dlmb/2)**2
+    return R * (2*np.arctan2(np.sqrt(a), np.sqrt(1-a)))
+
+def flat_dist2_km(lat0, lon0, lats, lons):
+    """Squared equirectangular distance (km²) from one point to arrays of points."""
+    dx = (lons - lon0) * (111.320 * math.cos(math.radians(lat0)))
+    dy = (lats - lat0) * 110.574
+    return dx*dx + dy*dy
+
+if HAVE_NUMBA:
+    # No fastmath: NaN coordinates must keep failing every comparison
+    @njit(cache=True, parallel=True)
+    def radius_masks_kernel(lats, lons, lat_min, lat_max, lon_min, lon_max,
+                            lat0, lon0, kx, ky, r2, r2_band, keep, near):
+        for i in prange(lats.shape[0]):
+            la = lats[i]; lo = lons[i]
+            inside = lat_min <= la <= lat_max and lon_min <= lo <= lon_max
+            dx = (lo - lon0) * kx; dy = (la - lat0) * ky
+            d2 = dx*dx + dy*dy
+            keep[i] = inside and d2 <= r2
+            near[i] = inside and abs(d2 - r2) <= r2_band
+
+def radius_masks(lats, lons, bbox, lat0, lon0, r2, r2_band):
+    """
+    (keep, near) masks: keep = inside bbox and the flat-earth radius,
+    near = inside bbox and within r2_band of radius² (needs the exact check).
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    if HAVE_NUMBA:
+        keep = np.empty(lats.shape[0], dtype=np.bool_)
+        near = np.empty(lats.shape[0], dtype=np.bool_)
+        radius_masks_kernel(lats, lons, lat_min, lat_max, lon_min, lon_max, lat0, lon0,
+                            111.320 * math.cos(math.radians(lat0)), 110.574, r2, r2_band, keep, near)
+        return keep, near
+    inside = (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+    d2 = flat_dist2_km(lat0, lon0, lats, lons)
+    return inside & (d2 <= r2), inside & (np.abs(d2 - r2) <= r2_band)
 
 def lon_span_deg(lat, radius_km):
     # ≈ 1° lon = 111.320 * cos(lat)
@@ -104,37 +194,85 @@ def hour_in_any_range(hh: int, ranges: List[Tuple[int, int]]) -> bool:
                 return True
     return False
 
+def hours_mask(ranges: List[Tuple[int, int]]) -> int:
+    """24-bit mask with bit h set iff hour h is within any of the ranges."""
+    return sum(1 << h for h in range(24) if hour_in_any_range(h, ranges))
+
 def hour_from_doc_id(doc_id: str) -> int:
     """
     Extract HH (0..23) from doc id like '001_20250608_120042'.
     Returns -1 if not parseable.
     """
-    try:
-        parts = doc_id.split("_")
-        hhmmss = parts[-1]
-        return int(hhmmss[:2])
-    except Exception:
-        return -1
+    # Fixed layout: the id always ends in _HHMMSS, so slice instead of split
+    hh = doc_id[-6:-4]
+    if len(doc_id) >= 7 and doc_id[-7] == "_" and hh.isascii() and hh.isdigit():
+        return int(hh)
+    return -1
+
+def hour_runs(allowed: int) -> List[Tuple[int, int]]:
+    """Contiguous [start, end) hour runs of a 24-bit hours mask."""
+    runs = []
+    h = 0
+    while h < 24:
+        if (allowed >> h) & 1:
+            start = h
+            while h < 24 and (allowed >> h) & 1:
+                h += 1
+            runs.append((start, h))
+        else:
+            h += 1
+    return runs
+
+def doc_id_ranges(users: List[str], days: List[str], allowed: int) -> List[Tuple[str, str]]:
+    """
+    [lo, hi) doc-id bounds for every user/day/hour run. IDs are USERID_YYYYMMDD_HHMMSS,
+    so each run is one lexicographic range (an end hour of 24 sorts after 23xxxx).
+    """
+    return [(f"{u}_{d}_{a:02d}0000", f"{u}_{d}_{b:02d}0000")
+            for u in users for d in days for a, b in hour_runs(allowed)]
+
+def days_between(date_from: str, date_to: str) -> List[str]:
+    """YYYYMMDD strings for every day in [date_from, date_to] (YYYY-MM-DD)."""
+    d = datetime.strptime(date_from, "%Y-%m-%d")
+    end = datetime.strptime(date_to, "%Y-%m-%d")
+    days = []
+    while d <= end:
+        days.append(d.strftime("%Y%m%d"))
+        d += timedelta(days=1)
+    return days
 
 # ---------------- CSV writer ----------------
-def write_csv(rows, out_path):
-    if not rows:
-        with open(out_path, "w", newline="", encoding="utf-8") as f:
+def write_csv(rows, out_path, fieldnames=None, header_rows=PAGE_SIZE):
+    """
+    Stream rows (dicts) to CSV and return how many were written.
+    With fieldnames the header is fixed and written as soon as the first row
+    arrives; otherwise it is the sorted union of keys over the first
+    header_rows rows, so only that many rows are held in memory.
+    """
+    rows = iter(rows)
+    head = list(itertools.islice(rows, 1 if fieldnames else header_rows))
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        if not head:
             w = csv.writer(f)
             w.writerow(["info"])
             w.writerow(["no rows matched your filters"])
-        return
-
-    keys = set()
-    for r in rows:
-        keys.update(r.keys())
-    headers = sorted(keys)
+            return 0
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        headers = list(fieldnames) if fieldnames else sorted(set().union(*head))
+        known = set(headers)
+        late = set()
         w = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
         w.writeheader()
+        w.writerows(head)
+        n = len(head)
         for r in rows:
+            if not known.issuperset(r):
+                late.update(set(r) - known)
             w.writerow(r)
+            n += 1
+    if late:
+        print(f"Note: fields not in the CSV header were left out: {', '.join(sorted(late))}")
+    return n
 
 # ---------------- Main ----------------
 def main():
@@ -163,7 +301,30 @@ def main():
         help="Time ranges, e.g. '23:00-07:00' (night), '07:00-23:00' (day), or multiple '06:00-09:00,13:00-15:00'"
     )
 
+    # Server-side LAT range (LAT itself is stored as a string)
+    ap.add_argument(
+        "--lat-num-field",
+        default=None,
+        help="Numeric mirror of LAT (e.g., LAT_num) for a server-side range filter; "
+             "needs a composite index on (PLMN asc, <field> asc)"
+    )
+
+    ap.add_argument("--fixed-schema", action="store_true",
+                    help="Write the DATA_FIELDS columns only instead of inferring the header from the data "
+                         "(only those fields are downloaded)")
+    ap.add_argument("--prefilter", action="store_true",
+                    help="Download only the filter fields, then batch-get the full documents that match")
+
+    # Doc-id range queries (USERID_YYYYMMDD_HHMMSS): only the in-window IDs are read
+    ap.add_argument("--users", default=None, help="Comma-separated user IDs, e.g. '001,002' (needs --date-from/--date-to)")
+    ap.add_argument("--date-from", default=None, help="YYYY-MM-DD, first day for --users")
+    ap.add_argument("--date-to",   default=None, help="YYYY-MM-DD, last day for --users")
+    ap.add_argument("--concurrency", type=int, default=8,
+                    help="Doc-id range queries in flight at once on the async client (1 = sequential, paged)")
+
     args = ap.parse_args()
+    if args.users and not (args.date_from and args.date_to):
+        ap.error("--users needs both --date-from and --date-to")
 
     # Resolve service account path
     sa_path = os.path.abspath(os.path.join(args.key_dir, args.key_file))
@@ -171,8 +332,9 @@ def main():
         raise FileNotFoundError(f"Service account not found at {sa_path}")
 
     time_ranges = parse_hours_spec(args.hours)
+    allowed_hours = hours_mask(time_ranges)
 
-    db = init_firestore(sa_path)
+    db = get_db(sa_path)
 
     # Build bounding box for quick filter
     dlat = lat_span_deg(args.radius_km)
@@ -180,51 +342,109 @@ def main():
     lat_min, lat_max = args.center_lat - dlat, args.center_lat + dlat
     lon_min, lon_max = args.center_lon - dlon, args.center_lon + dlon
 
-    # Start query; server-side filter by PLMN when possible
-    q = db.collection(args.collection)
-    try:
-        q = add_filter(q, "PLMN", "==", args.plmn)
-    except Exception:
-        pass
-
-    rows = []
-    matched = 0
-    for doc in q.stream():
-        data = doc.to_dict() or {}
-
-        # 1) Time filter via doc id hour
-        hh = hour_from_doc_id(doc.id)
-        if hh < 0 or not hour_in_any_range(hh, time_ranges):
-            continue
-
-        # 2) Ensure PLMN match if the field is present (string compare)
-        plmn_val = str(data.get("PLMN", "")).strip()
-        if plmn_val != args.plmn:
-            continue
-
-        # 3) Geo filter (LAT/LON or LAT/LNG)
+    # Server-side projection: the CSV schema, or just the filter fields for a prefilter pass
+    two_phase = args.prefilter and not args.fixed_schema
+    if args.fixed_schema:
+        fields = [f for f in DATA_FIELDS if f != "_doc_id"]
+    elif two_phase:
+        fields = FILTER_FIELDS
+    else:
+        fields = None
+    if fields and args.lat_num_field:
+        # Paging cursors need the order_by field in every returned snapshot
+        fields = fields + [args.lat_num_field]
+
+    def base_query(client):
+        # Start query; server-side filter by PLMN when possible
+        q = client.collection(args.collection)
         try:
-            lat_raw = data.get("LAT")
-            lon_raw = data.get("LON", data.get("LNG"))
-            lat = float(lat_raw) if lat_raw is not None else None
-            lon = float(lon_raw) if lon_raw is not None else None
+            q = add_filter(q, "PLMN", "==", args.plmn)
         except Exception:
-            continue
-        if lat is None or lon is None:
-            continue
-
-        # bbox then precise circle
-        if not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max):
-            continue
-        if haversine_km(args.center_lat, args.center_lon, lat, lon) > args.radius_km:
-            continue
-
-        # keep doc id for traceability
-        data["_doc_id"] = doc.id
-        rows.append(data)
-        matched += 1
-
-    write_csv(rows, args.out)
+            pass
+        if fields:
+            q = select_fields(q, fields)
+        return q
+
+    def id_range_queries(client, ranges):
+        col = client.collection(args.collection)
+        q = base_query(client)
+        # Explicit order on the range field, which the paging cursor relies on
+        return [add_filter(add_filter(q, DOC_ID, ">=", col.document(lo)), DOC_ID, "<", col.document(hi))
+                .order_by(DOC_ID) for lo, hi in ranges]
+
+    users = [u.strip() for u in args.users.split(",") if u.strip()] if args.users else []
+    if users:
+        # One doc-id range per user/day/hour run; the range is the single
+        # server-side inequality here, so LAT stays client-side
+        ranges = doc_id_ranges(users, days_between(args.date_from, args.date_to), allowed_hours)
+        if args.concurrency > 1:
+            docs = fetch_concurrent(id_range_queries(get_async_db(sa_path), ranges), args.concurrency)
+        else:
+            docs = itertools.chain.from_iterable(stream_paged(sq) for sq in id_range_queries(db, ranges))
+    else:
+        q = base_query(db)
+        # Firestore allows a range on one field only: LAT goes server-side,
+        # LON + radius stay client-side on the reduced set
+        if args.lat_num_field:
+            q = add_filter(q, args.lat_num_field, ">=", lat_min)
+            q = add_filter(q, args.lat_num_field, "<=", lat_max)
+            q = q.order_by(args.lat_num_field)
+        docs = stream_paged(q)
+
+    # Radius test constants, fixed for the whole run
+    r2 = args.radius_km ** 2
+    r2_band = 2 * RADIUS_TOL * r2
+
+    def geo_filter(batch, lats, lons):
+        # bbox then precise circle, vectorized over the batch
+        lats = np.array(lats, dtype=np.float64); lons = np.array(lons, dtype=np.float64)
+        keep, near = radius_masks(lats, lons, (lat_min, lat_max, lon_min, lon_max),
+                                  args.center_lat, args.center_lon, r2, r2_band)
+        keep[near] = haversine_km_vec(args.center_lat, args.center_lon, lats[near], lons[near]) <= args.radius_km
+        kept = [doc for doc, k in zip(batch, keep) if k]
+        if two_phase and kept:
+            # Second phase: full payloads for the matches only, in one BatchGetDocuments call
+            col = db.collection(args.collection)
+            full = {snap.id: snap for snap in db.get_all([col.document(doc.id) for doc in kept])}
+            kept = [full[doc.id] for doc in kept]
+        # Only the kept docs are turned into dicts; keep doc id for traceability
+        return [dict(doc.to_dict() or {}, _doc_id=doc.id) for doc in kept]
+
+    def matches():
+        # Paged fetch; matching rows go straight to the CSV writer
+        batch, lats, lons = [], [], []
+        for doc in docs:
+            # 1) Time filter via doc id hour
+            hh = hour_from_doc_id(doc.id)
+            if hh < 0 or not (allowed_hours >> hh) & 1:
+                continue
+
+            # 2) Ensure PLMN match if the field is present (string compare)
+            plmn_val = snap_field(doc, "PLMN")
+            if str("" if plmn_val is None else plmn_val).strip() != args.plmn:
+                continue
+
+            # 3) Geo filter (LAT/LON or LAT/LNG), single-field reads
+            try:
+                lat_raw = snap_field(doc, "LAT")
+                lon_raw = snap_field(doc, "LON")
+                if lon_raw is None:
+                    lon_raw = snap_field(doc, "LNG")
+                lat = float(lat_raw) if lat_raw is not None else None
+                lon = float(lon_raw) if lon_raw is not None else None
+            except Exception:
+                continue
+            if lat is None or lon is None:
+                continue
+
+            batch.append(doc); lats.append(lat); lons.append(lon)
+            if len(batch) >= GEO_BATCH:
+                yield from geo_filter(batch, lats, lons)
+                batch, lats, lons = [], [], []
+        if batch:
+            yield from geo_filter(batch, lats, lons)
+
+    matched = write_csv(matches(), args.out, fieldnames=DATA_FIELDS if args.fixed_schema else None)
     print(f"Exported {matched} measurements → {args.out}")
 
 if __name__ == "__main__":
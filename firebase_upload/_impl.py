@@ -0,0 +1,99 @@
+# Shared CSV → Firestore upload used by the firebase_upload entry scripts
+import csv
+import re
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for firebase_common
+from firebase_common import get_db
+
+BATCH_SIZE = 500  # Firestore limit per batch commit
+COMMIT_WORKERS = 4  # batch commits in flight while the CSV keeps being parsed
+
+NONDIGIT = re.compile(r"[^0-9]+")
+_ASCII_NONDIGITS = bytes(c for c in range(128) if not 48 <= c <= 57)
+
+def digits_only(s):
+    """s with everything but 0-9 removed."""
+    if s.isascii():
+        # bytes.translate deletes in one C pass, no regex dispatch
+        return s.encode("ascii").translate(None, _ASCII_NONDIGITS).decode("ascii")
+    return NONDIGIT.sub("", s)
+
+def upload_csv(path, user_suffix, user_id=None):
+    """
+    Upload a ';'-delimited G-MoN CSV into collection Data as USER_YYYYMMDD_HHMMSS docs.
+    user_id (default: user_suffix) is stored in each doc's userID field.
+    Returns the number of documents written.
+    """
+    db = get_db()
+    user_id = user_suffix if user_id is None else user_id
+
+    # === Read CSV file with ';' delimiter ===
+    with open(path, mode='r', encoding='utf-8') as file:
+        reader = csv.DictReader(file, delimiter=';')
+        reader.fieldnames = [h.strip() for h in reader.fieldnames]  # Header row, stripped once
+
+        with ThreadPoolExecutor(max_workers=COMMIT_WORKERS) as pool:
+            pending = deque()
+
+            def submit(b, ids):
+                # An id rewritten by an earlier batch still in flight waits for that
+                # commit first, so the last row in the file still wins
+                for f, held in pending:
+                    if not ids.isdisjoint(held):
+                        f.result()
+                pending.append((pool.submit(b.commit), ids))
+                # Bound memory to a few queued batches; result() re-raises a failed commit
+                while len(pending) > 2 * COMMIT_WORKERS:
+                    pending.popleft()[0].result()
+
+            batch = db.batch()
+            batch_ids = set()
+            count = 0
+            total = 0
+            for row in reader:
+                # Skip invalid rows: extra cells land under None, missing ones are None
+                if None in row or None in row.values():
+                    continue
+
+                data = {k: v.strip() for k, v in row.items()}
+
+                # Add userID
+                data["userID"] = user_id
+
+                # Numeric mirrors of LAT/LON (stored as strings) for server-side range queries
+                for key in ("LAT", "LON"):
+                    try:
+                        data[f"{key}_num"] = float(data[key])
+                    except (KeyError, ValueError):
+                        pass
+
+                # Extract DATE and TIME from the row
+                raw_date = data.get("DATE", "nodate")
+                raw_time = data.get("TIME", "notime")
+
+                # Clean the values from illegal separators in documents
+                safe_date = digits_only(raw_date)     # e.g., 20250714
+                safe_time = digits_only(raw_time)     # e.g., 135000
+
+                # Create unique ID without user_ prefix, only the number
+                doc_id = f"{user_suffix}_{safe_date}_{safe_time}"
+
+                # Add to main collection Data, BATCH_SIZE writes per commit
+                if count >= BATCH_SIZE:
+                    submit(batch, batch_ids)
+                    batch = db.batch()
+                    batch_ids = set()
+                    count = 0
+                batch.set(db.collection("Data").document(doc_id), data)
+                batch_ids.add(doc_id)
+                count += 1
+                total += 1
+
+            if count:
+                submit(batch, batch_ids)
+            for f, _ in pending:
+                f.result()
+    return total
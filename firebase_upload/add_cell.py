@@ -1,12 +1,10 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for firebase_common
+from firebase_common import get_client
 
-# Load service account key
-cred = credentials.Certificate("Firebase_Key.json")
-firebase_admin.initialize_app(cred)
-
-# Connect to Firestore
-db = firestore.client()
+# Connect to Firestore (plain client, no firebase_admin; service account key: Firebase_Key.json)
+db = get_client()
 
 # Collect details from user input
 # cellID = input("Enter Cell ID: ")
@@ -1,12 +1,10 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for firebase_common
+from firebase_common import get_client
 
-# Load the service account file
-cred = credentials.Certificate("Firebase_Key.json")
-firebase_admin.initialize_app(cred)
-
-# Connect to the Firestore database
-db = firestore.client()
+# Connect to the Firestore database (plain client, no firebase_admin; service account file: Firebase_Key.json)
+db = get_client()
 
 # Example of adding a document
 doc_ref = db.collection("Users").document("005")
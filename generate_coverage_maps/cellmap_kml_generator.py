@@ -1,11 +1,28 @@
 #!/usr/bin/env python3
 import argparse
+import csv
+import io
 import math
+import zipfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 import re
+from scipy.spatial import cKDTree
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to the pandas C parser
+    pacsv = None
+
+try:
+    import polars as pl
+except ImportError:  # optional: multi-threaded CSV parser, preferred when installed
+    pl = None
 
 
 KML_NS = "http://www.opengis.net/kml/2.2"
@@ -14,30 +31,43 @@ GMON_ICON = "https://sites.google.com/site/pynetmony/home/iconrxl.png"
 def clamp(x, a, b):
     return max(a, min(b, x))
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000.0
-    phi1 = math.radians(lat1); phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1); dl = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dl/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
-
-def idw_predict(lat, lon, pts: List[Tuple[float,float,float]], neighbors=12, power=2.0) -> Optional[float]:
-    if not pts:
-        return None
-    dists = [(haversine(lat, lon, la, lo), v) for la, lo, v in pts]
-    dists.sort(key=lambda x: x[0])
-    used = dists[:neighbors]
-    if used and used[0][0] < 5.0:
-        return used[0][1]
-    if used and used[0][0] > 2000:
-        return None
-    num = 0.0
-    den = 0.0
-    for d, v in used:
-        w = 1.0 / ((d + 1e-6) ** power)
-        num += w * v
-        den += w
-    return num / den if den > 0 else None
+def grid_axis(lo, hi, step):
+    # Tile origins lo, lo+step, ... up to and including hi, computed from an
+    # integer index so there is no float drift and no lost/extra last row
+    n = int(math.floor((hi - lo) / step + 1e-9)) + 1
+    return lo + np.arange(n) * step
+
+def project_xy(lat, lon, lat0, lon0):
+    # local equirectangular projection to meters (accurate over a few-km box)
+    return np.column_stack([(lon - lon0) * 111320.0 * math.cos(math.radians(lat0)),
+                            (lat - lat0) * 110574.0])
+
+def idw_predict_grid(lat, lon, pla, plo, pv, neighbors=12, power=2.0, workers=-1,
+                     max_range=2000.0) -> np.ndarray:
+    # Vectorized IDW for all tiles at once; NaN where no prediction is made
+    pred = np.full(lat.shape[0], np.nan)
+    k = min(neighbors, pla.shape[0])
+    if k == 0:
+        return pred
+    lat0 = 0.5 * (pla.min() + pla.max()); lon0 = 0.5 * (plo.min() + plo.max())
+    tree = cKDTree(project_xy(pla, plo, lat0, lon0))
+    xy = project_xy(lat, lon, lat0, lon0)
+    # The grid spans a few km, so flat-earth distances in the projected plane
+    # are within a fraction of a percent of haversine and need no trig per pair.
+    # Queries run on `workers` threads (-1 = all cores).
+    # Tiles farther than max_range from every point get no prediction, so a
+    # cheap bounded nearest-point pass culls them before the full k-NN.
+    d1, _ = tree.query(xy, k=1, distance_upper_bound=max_range, workers=workers)
+    alive = np.isfinite(d1)
+    Dk, idx = tree.query(xy[alive], k=k, workers=workers)
+    Dk = Dk.reshape(-1, k); idx = idx.reshape(-1, k)
+    Vk = pv[idx]
+    W = 1.0 / ((Dk + 1e-6) ** power)
+    out = (W * Vk).sum(1) / W.sum(1)
+    snap = Dk[:, 0] < 5.0
+    out[snap] = Vk[snap, 0]
+    pred[alive] = out
+    return pred
 
 # ---- GMoN-like icon styles table (id, aabbggrr color) ----
 STYLE_TABLE = [
@@ -48,6 +78,8 @@ STYLE_TABLE = [
     ('rxl69',  'ff0000ff'),  # very good
     ('rxl92',  'ff00ff00'),  # excellent (green)
 ]
+# bbggrr part of each style color, for tiles that carry their own alpha
+_STYLE_BGR = {sid: color[2:] for sid, color in STYLE_TABLE}
 
 def kml_header(name: str) -> str:
     parts = []
@@ -75,18 +107,18 @@ def kml_header(name: str) -> str:
 def kml_footer() -> str:
     return '  </Document>\n</kml>\n'
 
-def kml_point(name: str, lat: float, lon: float, desc: str, style_id: str) -> str:
-    return (
-f'    <Placemark>\n'
-f'      <name>{name}</name>\n'
-f'      <description><![CDATA[{desc}]]></description>\n'
-f'      <styleUrl>#{style_id}</styleUrl>\n'
-f'      <Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point>\n'
-f'    </Placemark>\n'
-    )
+# Placemark templates, parsed once at import
+_POINT_TMPL = (
+'    <Placemark>\n'
+'      <name>{name}</name>\n'
+'      <description><![CDATA[{desc}]]></description>\n'
+'      <styleUrl>#{style_id}</styleUrl>\n'
+'      <Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point>\n'
+'    </Placemark>\n'
+)
 
-def kml_tile_polygon(lat_min, lon_min, lat_max, lon_max, fill_color: str) -> str:
-    return f'''    <Placemark>
+# Tile corners at 4 decimals (~11 m), well under the grid step
+_TILE_TMPL = '''    <Placemark>
       <Style>
         <PolyStyle>
           <color>{fill_color}</color>
@@ -96,19 +128,76 @@ def kml_tile_polygon(lat_min, lon_min, lat_max, lon_max, fill_color: str) -> str
       <Polygon>
         <outerBoundaryIs>
           <LinearRing>
-            <coordinates>
-              {lon_min:.6f},{lat_min:.6f},0
-              {lon_max:.6f},{lat_min:.6f},0
-              {lon_max:.6f},{lat_max:.6f},0
-              {lon_min:.6f},{lat_max:.6f},0
-              {lon_min:.6f},{lat_min:.6f},0
-            </coordinates>
+            <coordinates>{lon_min:.4f},{lat_min:.4f},0 {lon_max:.4f},{lat_min:.4f},0 {lon_max:.4f},{lat_max:.4f},0 {lon_min:.4f},{lat_max:.4f},0 {lon_min:.4f},{lat_min:.4f},0</coordinates>
           </LinearRing>
         </outerBoundaryIs>
       </Polygon>
     </Placemark>
 '''
 
+TILE_BATCH = 4096
+
+def kml_point(name: str, lat: float, lon: float, desc: str, style_id: str) -> str:
+    return _POINT_TMPL.format(name=name, lat=lat, lon=lon, desc=desc, style_id=style_id)
+
+def kml_tile_polygon(lat_min, lon_min, lat_max, lon_max, fill_color: str) -> str:
+    return _TILE_TMPL.format(lat_min=lat_min, lon_min=lon_min, lat_max=lat_max, lon_max=lon_max,
+                             fill_color=fill_color)
+
+@contextmanager
+def open_kml(path: str):
+    # text stream for the KML; a path ending in .kmz gets doc.kml deflated inside a zip
+    if not path.lower().endswith('.kmz'):
+        with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            yield f
+        return
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as z:
+        with z.open('doc.kml', 'w') as raw:
+            f = io.TextIOWrapper(raw, encoding='utf-8')
+            yield f
+            f.flush(); f.detach()
+
+def report_written(path: str):
+    if path.lower().endswith('.kmz'):
+        with zipfile.ZipFile(path) as z:
+            info = z.getinfo('doc.kml')
+        print(f'Wrote KMZ → {path} ({info.file_size:,} bytes KML, {info.compress_size:,} compressed)')
+    else:
+        print(f'Wrote KML → {path}')
+
+def write_tiles(f, lat_lo, lon_lo, lat_hi, lon_hi, colors: List[str], batch: int = TILE_BATCH):
+    # stream tile placemarks to f, joining one batch at a time
+    for s in range(0, len(colors), batch):
+        f.write(''.join([kml_tile_polygon(la, lo, la2, lo2, c) for la, lo, la2, lo2, c in
+                         zip(lat_lo[s:s+batch].tolist(), lon_lo[s:s+batch].tolist(),
+                             lat_hi[s:s+batch].tolist(), lon_hi[s:s+batch].tolist(), colors[s:s+batch])]))
+
+def merge_tiles(codes: np.ndarray):
+    # Greedy rectangles over a [nlat, nlon] grid of color codes (-1 = no tile):
+    # split each row into equal-code runs, and let a run extend the rectangle
+    # directly above it when span and code match.
+    # Returns (row0, col0, row1, col1, code) arrays; row1/col1 are exclusive
+    nlat, nlon = codes.shape
+    rects = []
+    above = {}
+    for r in range(nlat):
+        row = codes[r]
+        starts = np.flatnonzero(np.r_[True, row[1:] != row[:-1]])
+        ends = np.r_[starts[1:], nlon]
+        cur = {}
+        for c0, c1, code in zip(starts.tolist(), ends.tolist(), row[starts].tolist()):
+            if code < 0:
+                continue
+            k = above.get((c0, c1, code))
+            if k is None:
+                k = len(rects)
+                rects.append([r, c0, r + 1, c1, code])
+            else:
+                rects[k][2] = r + 1
+            cur[(c0, c1, code)] = k
+        above = cur
+    return np.array(rects, dtype=np.int64).reshape(-1, 5).T
+
 def continuous_tile_color(value: float, metric: str, alpha: int) -> str:
     # Typical ranges: RSRP [-120, -80], RSSI [-110, -60]
     if metric.upper() == "RSRP":
@@ -129,46 +218,68 @@ def continuous_tile_color(value: float, metric: str, alpha: int) -> str:
 
     return f"{alpha:02x}{b:02x}{g:02x}{r:02x}"
 
+MEAS_FIELDS = ['SYSTEM','PLMN','xNBID','LOCAL_CID','PCI/PSC/BSIC','ARFCN','BAND','RSSI','RSRP/RSCP','RSRQ/ECIO','SNR','DATE','TIME']
 
+# Style cutoffs: a value <= cut[i] (and > cut[i-1]) gets _STYLE_IDS[i]
+_STYLE_IDS = np.array([sid for sid, _ in STYLE_TABLE])
+_RSRP_CUT = np.array([-115, -105, -95, -90, -85], dtype=float)
+_RSSI_CUT = np.array([-110, -100, -90, -80, -70], dtype=float)
 
-def style_for_value(metric: str, val: float) -> str:
-    m = metric.upper()
-    if m == 'RSRP':
-        if val <= -115: return 'rxl113'
-        if val <= -105: return 'rxl105'
-        if val <= -95:  return 'rxl80'
-        if val <= -90:  return 'rxl76'
-        if val <= -85:  return 'rxl69'
-        return 'rxl92'
-    else:
-        if val <= -110: return 'rxl113'
-        if val <= -100: return 'rxl105'
-        if val <= -90:  return 'rxl80'
-        if val <= -80:  return 'rxl76'
-        if val <= -70:  return 'rxl69'
-        return 'rxl92'
-
-def choose_metric(row, prefer: str):
+def style_for_values(metric, vals: np.ndarray) -> np.ndarray:
+    # style ids for arrays of values; metric is one name or an array of names
+    rsrp = np.char.upper(np.asarray(metric, dtype=str)) == 'RSRP'
+    pos = np.where(rsrp, np.searchsorted(_RSRP_CUT, vals, side='left'),
+                   np.searchsorted(_RSSI_CUT, vals, side='left'))
+    return _STYLE_IDS[pos]
+
+def _numeric_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors='coerce').to_numpy(float)
+
+def choose_metric(df: pd.DataFrame, prefer: str):
+    # per-row (metric name, value) arrays; value is NaN where the row has no usable metric
+    rsrp = _numeric_col(df, 'RSRP/RSCP')
+    rssi = _numeric_col(df, 'RSSI')
+    if prefer == 'RSRP':
+        return np.full(len(df), 'RSRP'), rsrp
+    elif prefer == 'RSSI':
+        return np.full(len(df), 'RSSI'), rssi
+    use_rsrp = np.isin(_numeric_col(df, 'SYSTEM'), (4, 7)) & ~np.isnan(rsrp)
+    return np.where(use_rsrp, 'RSRP', 'RSSI'), np.where(use_rsrp, rsrp, rssi)
+
+def _id_strings(col: pd.Series) -> List[Optional[str]]:
+    return [str(int(v)) if pd.notna(v) else None for v in col.tolist()]
+
+def _read_csv_sniffed(path: str) -> pd.DataFrame:
+    # Sniff the delimiter once, then parse with Polars, Arrow or the pandas C engine
+    with open(path, 'rb') as f:
+        head = f.read(8192).decode('utf-8', 'replace')
     try:
-        if prefer == 'RSRP':
-            v = row.get('RSRP/RSCP')
-            return ('RSRP', float(v)) if pd.notna(v) else None
-        elif prefer == 'RSSI':
-            v = row.get('RSSI')
-            return ('RSSI', float(v)) if pd.notna(v) else None
-        else:
-            sys = int(row.get('SYSTEM')) if pd.notna(row.get('SYSTEM')) else None
-            if sys in (4, 7):
-                v = row.get('RSRP/RSCP')
-                if pd.notna(v):
-                    return ('RSRP', float(v))
-            v = row.get('RSSI')
-            return ('RSSI', float(v)) if pd.notna(v) else None
-    except Exception:
-        return None
+        delim = csv.Sniffer().sniff(head.splitlines()[0] if head else head).delimiter
+    except (csv.Error, IndexError):
+        return pd.read_csv(path, sep=None, engine='python')
+    if pl is not None:
+        # try_parse_dates=False keeps DATE/TIME as the original text
+        pdf = pl.read_csv(path, separator=delim, infer_schema_length=None, try_parse_dates=False)
+        return pd.DataFrame({s.name: s.to_numpy() for s in pdf.get_columns()})
+    if pacsv is None:
+        return pd.read_csv(path, sep=delim)
+    parse = pacsv.ParseOptions(delimiter=delim)
+    tbl = pacsv.read_csv(path, parse_options=parse,
+                         convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+    # Arrow infers ISO dates/times; keep those columns as the original text like pandas does
+    temporal = [fld.name for fld in tbl.schema if pa.types.is_temporal(fld.type)]
+    if temporal:
+        txt = pacsv.read_csv(path, parse_options=parse, convert_options=pacsv.ConvertOptions(
+            include_columns=temporal, column_types={c: pa.string() for c in temporal},
+            strings_can_be_null=True))
+        for c in temporal:
+            tbl = tbl.set_column(tbl.schema.get_field_index(c), c, txt[c])
+    return tbl.to_pandas()
 
 def _read_measurements_auto(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, sep=None, engine="python")  # auto-detect delimiter
+    df = _read_csv_sniffed(path)  # auto-detect delimiter
     norm = {}
     for c in df.columns:
         k = re.sub(r"[\s_-]+","",str(c).strip().lower())
@@ -193,13 +304,17 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--measurements', required=True)
     ap.add_argument('--antennas', required=False)
-    ap.add_argument('--out', required=True)
+    ap.add_argument('--out', required=True, help='Output .kml (or .kmz for a zipped KML)')
     ap.add_argument('--metric', default='auto', choices=['auto','RSRP','RSSI'])
     ap.add_argument('--grid_step_deg', type=float, default=0.001)
     ap.add_argument('--idw_neighbors', type=int, default=12)
     ap.add_argument('--idw_power', type=float, default=2.0)
     ap.add_argument('--tile_alpha', type=int, default=120)
+    ap.add_argument('--no_merge', action='store_true', help='One polygon per grid cell instead of merged same-color rectangles')
+    ap.add_argument('--jobs', type=int, default=-1, help='Worker threads for the IDW grid (-1 = all cores)')
     args = ap.parse_args()
+    if args.jobs != -1 and args.jobs < 1:
+        ap.error('--jobs must be -1 (all cores) or >= 1')
 
     df = _read_measurements_auto(args.measurements)
 
@@ -207,27 +322,18 @@ def main():
         print('Error: CSV missing LAT/LON columns.', file=sys.stderr)
         sys.exit(2)
 
-    placemarks = []
-    meas_pts: List[Tuple[float,float,float]] = []
-    for i, row in df.iterrows():
-        lat = row['LAT']; lon = row['LON']
-        if pd.isna(lat) or pd.isna(lon):
-            continue
-        mv = choose_metric(row, args.metric)
-        if mv is None:
-            continue
-        metric_name, value = mv
-        sid = style_for_value(metric_name, value)
-        fields = ['SYSTEM','PLMN','xNBID','LOCAL_CID','PCI/PSC/BSIC','ARFCN','BAND','RSSI','RSRP/RSCP','RSRQ/ECIO','SNR','DATE','TIME']
-        desc = '<br/>'.join([f'<b>{k}</b>: {row.get(k)}' for k in fields if k in df.columns])
-        name_parts = []
-        if 'xNBID' in df.columns and pd.notna(row.get('xNBID')):
-            name_parts.append(str(int(row.get('xNBID'))))
-        if 'LOCAL_CID' in df.columns and pd.notna(row.get('LOCAL_CID')):
-            name_parts.append(str(int(row.get('LOCAL_CID'))))
-        name = '-'.join(name_parts) if name_parts else f'Meas {i}'
-        placemarks.append(kml_point(name, float(lat), float(lon), desc, sid))
-        meas_pts.append((float(lat), float(lon), float(value)))
+    lat_arr = df['LAT'].to_numpy(float); lon_arr = df['LON'].to_numpy(float)
+    metric_arr, value_arr = choose_metric(df, args.metric)
+    valid = ~np.isnan(lat_arr) & ~np.isnan(lon_arr) & ~np.isnan(value_arr)
+    meas = df[valid]
+    pla, plo, pv = lat_arr[valid], lon_arr[valid], value_arr[valid]
+    sids = style_for_values(metric_arr[valid], pv)
+    fields = [k for k in MEAS_FIELDS if k in df.columns]
+    cols = [meas[k].tolist() for k in fields]
+    descs = ['<br/>'.join([f'<b>{k}</b>: {v}' for k, v in zip(fields, vals)]) for vals in zip(*cols)] if cols else [''] * len(meas)
+    name_cols = [_id_strings(meas[c]) for c in ('xNBID', 'LOCAL_CID') if c in df.columns]
+    names = ['-'.join([p for p in parts if p is not None]) or f'Meas {i}' for i, *parts in zip(meas.index, *name_cols)]
+    placemarks = [kml_point(n, la, lo, d, sid) for n, la, lo, d, sid in zip(names, pla.tolist(), plo.tolist(), descs, sids.tolist())]
 
     antenna_placemarks = []
     if args.antennas and Path(args.antennas).exists():
@@ -236,58 +342,63 @@ def main():
         latc = colmap.get('lat'); lonc = colmap.get('lon')
         namec = colmap.get('name', None)
         if latc and lonc:
-            for _, r in adf.iterrows():
+            names = adf[namec].tolist() if namec else [None] * len(adf)
+            ids = adf[colmap['id']].tolist() if 'id' in colmap else [None] * len(adf)
+            for raw_lat, raw_lon, nm, aid in zip(adf[latc].tolist(), adf[lonc].tolist(), names, ids):
                 try:
-                    alat = float(r[latc]); alon = float(r[lonc])
+                    alat = float(raw_lat); alon = float(raw_lon)
                 except Exception:
                     continue
-                nm = str(r[namec]) if namec and pd.notna(r[namec]) else 'Antenna'
-                desc = ''
-                if 'id' in colmap and pd.notna(r[colmap['id']]):
-                    desc = 'ID: {}'.format(r[colmap['id']])
+                nm = str(nm) if pd.notna(nm) else 'Antenna'
+                desc = 'ID: {}'.format(aid) if pd.notna(aid) else ''
                 antenna_placemarks.append(kml_point(nm, alat, alon, desc, 'antenna'))
 
-    if meas_pts:
-        lats = [p[0] for p in meas_pts]; lons = [p[1] for p in meas_pts]
-        lat_min, lat_max = min(lats)-0.002, max(lats)+0.002
-        lon_min, lon_max = min(lons)-0.002, max(lons)+0.002
+    if pv.size:
+        lat_min, lat_max = pla.min()-0.002, pla.max()+0.002
+        lon_min, lon_max = plo.min()-0.002, plo.max()+0.002
     else:
         lat_min = lon_min = 0; lat_max = lon_max = 0
 
-    tiles = []
-    if meas_pts:
-        step = args.grid_step_deg
-        lat = lat_min
-        while lat <= lat_max:
-            lon = lon_min
-            while lon <= lon_max:
-                pred = idw_predict(lat, lon, meas_pts, neighbors=args.idw_neighbors, power=args.idw_power)
-                if pred is not None:
-                    # pick base color from style table using RSRP mapping, then override alpha
-                    sid = style_for_value('RSRP', pred)
-                    table = dict(STYLE_TABLE)
-                    base = table.get(sid, 'ff00ff00')  # default green
-                    a = max(0, min(255, int(args.tile_alpha)))
-                    fill_color = f"{a:02x}{base[2:]}"  # aabbggrr
-                    tiles.append(kml_tile_polygon(lat, lon, lat+step, lon+step, fill_color))
-                lon += step
-            lat += step
+    step = args.grid_step_deg
+    tile_lat = tile_lon = tile_lat2 = tile_lon2 = np.empty(0)
+    tile_colors = []
+    if pv.size:
+        lats_grid = grid_axis(lat_min, lat_max, step)
+        lons_grid = grid_axis(lon_min, lon_max, step)
+        LA, LO = np.meshgrid(lats_grid, lons_grid, indexing='ij')
+        LA = LA.ravel(); LO = LO.ravel()
+        pred = idw_predict_grid(LA, LO, pla, plo, pv, neighbors=args.idw_neighbors, power=args.idw_power,
+                                workers=args.jobs)
+        keep = ~np.isnan(pred)
+        a_prefix = f"{max(0, min(255, int(args.tile_alpha))):02x}"
+        # pick base color from style table using RSRP mapping, then override alpha
+        sids, code = np.unique(style_for_values('RSRP', pred[keep]), return_inverse=True)
+        palette = [a_prefix + _STYLE_BGR.get(sid, '00ff00') for sid in sids.tolist()]  # aabbggrr, default green
+        if args.no_merge:
+            tile_lat, tile_lon = LA[keep], LO[keep]
+            tile_lat2, tile_lon2 = tile_lat + step, tile_lon + step
+        else:
+            codes = np.full(LA.shape[0], -1, dtype=np.int64)
+            codes[keep] = code
+            r0, c0, r1, c1, code = merge_tiles(codes.reshape(len(lats_grid), len(lons_grid)))
+            tile_lat, tile_lat2 = lat_min + r0 * step, lat_min + r1 * step
+            tile_lon, tile_lon2 = lon_min + c0 * step, lon_min + c1 * step
+        tile_colors = [palette[c] for c in code.tolist()]
 
     name = 'Coverage map (GMoN-like points + bolder IDW tiles)'
-    kml_parts = [kml_header(name)]
-    kml_parts.append('    <Folder><name>Prediction (IDW tiles)</name>\n')
-    kml_parts.extend(tiles)
-    kml_parts.append('    </Folder>\n')
-    kml_parts.append('    <Folder><name>Measurements</name>\n')
-    kml_parts.extend(placemarks)
-    kml_parts.append('    </Folder>\n')
-    kml_parts.append('    <Folder><name>Antennas</name>\n')
-    kml_parts.extend(antenna_placemarks)
-    kml_parts.append('    </Folder>\n')
-    kml_parts.append(kml_footer())
-
-    Path(args.out).write_text(''.join(kml_parts), encoding='utf-8')
-    print(f'Wrote KML → {args.out}')
+    with open_kml(args.out) as f:
+        f.write(kml_header(name))
+        f.write('    <Folder><name>Prediction (IDW tiles)</name>\n')
+        write_tiles(f, tile_lat, tile_lon, tile_lat2, tile_lon2, tile_colors)
+        f.write('    </Folder>\n')
+        f.write('    <Folder><name>Measurements</name>\n')
+        f.write(''.join(placemarks))
+        f.write('    </Folder>\n')
+        f.write('    <Folder><name>Antennas</name>\n')
+        f.write(''.join(antenna_placemarks))
+        f.write('    </Folder>\n')
+        f.write(kml_footer())
+    report_written(args.out)
 
 if __name__ == '__main__':
     main()
@@ -1,10 +1,33 @@
 #!/usr/bin/env python3
 import argparse
+import csv
+import io
 import math
+import zipfile
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Tuple, Optional
 
+import numpy as np
 import pandas as pd
+from scipy.spatial import cKDTree
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to the pandas C parser
+    pacsv = None
+
+try:
+    import polars as pl
+except ImportError:  # optional: multi-threaded CSV parser, preferred when installed
+    pl = None
+
+try:
+    from numba import config as numba_config, njit, prange, set_num_threads
+    HAVE_NUMBA = True
+except ImportError:  # optional: fall back to the NumPy kernel
+    HAVE_NUMBA = False
 
 KML_NS = "http://www.opengis.net/kml/2.2"
 GMON_ICON = "https://sites.google.com/site/pynetmony/home/iconrxl.png"
@@ -13,15 +36,46 @@ GMON_ICON = "https://sites.google.com/site/pynetmony/home/iconrxl.png"
 def clamp(x, a, b):
     return max(a, min(b, x))
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000.0
-    phi1 = math.radians(lat1); phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1); dl = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dl/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
+def grid_axis(lo, hi, step):
+    # Tile origins lo, lo+step, ... up to and including hi, computed from an
+    # integer index so there is no float drift and no lost/extra last row
+    n = int(math.floor((hi - lo) / step + 1e-9)) + 1
+    return lo + np.arange(n) * step
+
+def project_xy(lat, lon, lat0, lon0):
+    # local equirectangular projection to meters (accurate over a few-km box)
+    return np.column_stack([(lon - lon0) * 111320.0 * math.cos(math.radians(lat0)),
+                            (lat - lat0) * 110574.0])
+
+def _read_csv_sniffed(path: str) -> pd.DataFrame:
+    # Sniff the delimiter once, then parse with Polars, Arrow or the pandas C engine
+    with open(path, 'rb') as f:
+        head = f.read(8192).decode('utf-8', 'replace')
+    try:
+        delim = csv.Sniffer().sniff(head.splitlines()[0] if head else head).delimiter
+    except (csv.Error, IndexError):
+        return pd.read_csv(path, sep=None, engine='python')
+    if pl is not None:
+        # try_parse_dates=False keeps DATE/TIME as the original text
+        pdf = pl.read_csv(path, separator=delim, infer_schema_length=None, try_parse_dates=False)
+        return pd.DataFrame({s.name: s.to_numpy() for s in pdf.get_columns()})
+    if pacsv is None:
+        return pd.read_csv(path, sep=delim)
+    parse = pacsv.ParseOptions(delimiter=delim)
+    tbl = pacsv.read_csv(path, parse_options=parse,
+                         convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+    # Arrow infers ISO dates/times; keep those columns as the original text like pandas does
+    temporal = [fld.name for fld in tbl.schema if pa.types.is_temporal(fld.type)]
+    if temporal:
+        txt = pacsv.read_csv(path, parse_options=parse, convert_options=pacsv.ConvertOptions(
+            include_columns=temporal, column_types={c: pa.string() for c in temporal},
+            strings_can_be_null=True))
+        for c in temporal:
+            tbl = tbl.set_column(tbl.schema.get_field_index(c), c, txt[c])
+    return tbl.to_pandas()
 
 def _read_measurements_auto(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, sep=None, engine='python')
+    df = _read_csv_sniffed(path)  # auto-detect delimiter
     # Normalize column names to support variants
     norm = {}
     for c in df.columns:
@@ -82,122 +136,213 @@ def kml_header(name: str) -> str:
 def kml_footer() -> str:
     return '  </Document>\n</kml>\n'
 
+# Placemark templates, parsed once at import
+_POINT_TMPL = (
+'    <Placemark>\n'
+'      <name>{name}</name>\n'
+'      <description><![CDATA[{desc}]]></description>\n'
+'      <styleUrl>#{style_id}</styleUrl>\n'
+'      <Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point>\n'
+'    </Placemark>\n'
+)
+
+# No outline at all — smooth carpet look
+# Tile corners at 4 decimals (~11 m), well under the grid step
+_TILE_TMPL = (
+'    <Placemark>\n'
+'      <Style>\n'
+'        <PolyStyle><color>{fill_color}</color><outline>0</outline></PolyStyle>\n'
+'      </Style>\n'
+'      <Polygon>\n'
+'        <outerBoundaryIs>\n'
+'          <LinearRing>\n'
+'            <coordinates>{lon_min:.4f},{lat_min:.4f},0 {lon_max:.4f},{lat_min:.4f},0 '
+'{lon_max:.4f},{lat_max:.4f},0 {lon_min:.4f},{lat_max:.4f},0 {lon_min:.4f},{lat_min:.4f},0</coordinates>\n'
+'          </LinearRing>\n'
+'        </outerBoundaryIs>\n'
+'      </Polygon>\n'
+'    </Placemark>\n'
+)
+
+TILE_BATCH = 4096
+
 def kml_point(name: str, lat: float, lon: float, desc: str, style_id: str) -> str:
-    return (
-f'    <Placemark>\n'
-f'      <name>{name}</name>\n'
-f'      <description><![CDATA[{desc}]]></description>\n'
-f'      <styleUrl>#{style_id}</styleUrl>\n'
-f'      <Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point>\n'
-f'    </Placemark>\n'
-    )
+    return _POINT_TMPL.format(name=name, lat=lat, lon=lon, desc=desc, style_id=style_id)
 
 def kml_tile_polygon(lat_min, lon_min, lat_max, lon_max, fill_color: str) -> str:
-    # No outline at all — smooth carpet look
-    return (
-f'    <Placemark>\n'
-f'      <Style>\n'
-f'        <PolyStyle><color>{fill_color}</color><outline>0</outline></PolyStyle>\n'
-f'      </Style>\n'
-f'      <Polygon>\n'
-f'        <outerBoundaryIs>\n'
-f'          <LinearRing>\n'
-f'            <coordinates>\n'
-f'              {lon_min:.6f},{lat_min:.6f},0\n'
-f'              {lon_max:.6f},{lat_min:.6f},0\n'
-f'              {lon_max:.6f},{lat_max:.6f},0\n'
-f'              {lon_min:.6f},{lat_max:.6f},0\n'
-f'              {lon_min:.6f},{lat_min:.6f},0\n'
-f'            </coordinates>\n'
-f'          </LinearRing>\n'
-f'        </outerBoundaryIs>\n'
-f'      </Polygon>\n'
-f'    </Placemark>\n'
-    )
-
-# Continuous gradient color for tiles (red→yellow→green)
-def continuous_tile_color(value: float, metric: str, alpha: int) -> str:
-    if metric.upper() == 'RSRP':
-        lo, hi = -120.0, -80.0
-    else:
-        lo, hi = -110.0, -60.0
-    t = clamp((value - lo) / (hi - lo), 0.0, 1.0)
-    if t < 0.5:
-        frac = t / 0.5
-        r, g, b = 255, int(255 * frac), 0
-    else:
-        frac = (t - 0.5) / 0.5
-        r, g, b = int(255 * (1 - frac)), 255, 0
-    return f"{alpha:02x}{b:02x}{g:02x}{r:02x}"  # aabbggrr
-
-def style_for_value(metric: str, val: float) -> str:
-    m = metric.upper()
-    if m == 'RSRP':
-        if val <= -115: return 'rxl113'
-        if val <= -105: return 'rxl105'
-        if val <= -95:  return 'rxl80'
-        if val <= -90:  return 'rxl76'
-        if val <= -85:  return 'rxl69'
-        return 'rxl92'
+    return _TILE_TMPL.format(lat_min=lat_min, lon_min=lon_min, lat_max=lat_max, lon_max=lon_max,
+                             fill_color=fill_color)
+
+@contextmanager
+def open_kml(path: str):
+    # text stream for the KML; a path ending in .kmz gets doc.kml deflated inside a zip
+    if not path.lower().endswith('.kmz'):
+        with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            yield f
+        return
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as z:
+        with z.open('doc.kml', 'w') as raw:
+            f = io.TextIOWrapper(raw, encoding='utf-8')
+            yield f
+            f.flush(); f.detach()
+
+def report_written(path: str):
+    if path.lower().endswith('.kmz'):
+        with zipfile.ZipFile(path) as z:
+            info = z.getinfo('doc.kml')
+        print(f'Wrote KMZ → {path} ({info.file_size:,} bytes KML, {info.compress_size:,} compressed)')
     else:
-        if val <= -110: return 'rxl113'
-        if val <= -100: return 'rxl105'
-        if val <= -90:  return 'rxl80'
-        if val <= -80:  return 'rxl76'
-        if val <= -70:  return 'rxl69'
-        return 'rxl92'
+        print(f'Wrote KML → {path}')
+
+def write_tiles(f, lats, lons, step: float, colors: List[str], batch: int = TILE_BATCH):
+    # stream tile placemarks to f, joining one batch at a time
+    for s in range(0, len(colors), batch):
+        f.write(''.join([kml_tile_polygon(la, lo, la+step, lo+step, c) for la, lo, c in
+                         zip(lats[s:s+batch].tolist(), lons[s:s+batch].tolist(), colors[s:s+batch])]))
+
+# Continuous gradient color for tiles (red→yellow→green).
+# The gradient has 511 distinct bbggrr steps: index g (0..254) is red→yellow
+# with r=255, index 510-r is yellow→green with g=255.
+_GRADIENT_BGR = np.array([f"00{g:02x}ff" for g in range(255)] +
+                         [f"00ff{r:02x}" for r in range(255, -1, -1)])
+
+def continuous_tile_colors(values: np.ndarray, metric_idx: np.ndarray, alpha: int) -> np.ndarray:
+    # aabbggrr colors for arrays of values; metric_idx indexes METRICS
+    rsrp = metric_idx == METRICS.index('RSRP')
+    lo = np.where(rsrp, -120.0, -110.0)
+    hi = np.where(rsrp, -80.0, -60.0)
+    t = np.clip((values - lo) / (hi - lo), 0.0, 1.0)
+    g = (255 * (t / 0.5)).astype(np.int64)
+    r = (255 * (1 - (t - 0.5) / 0.5)).astype(np.int64)
+    code = np.where(t < 0.5, g, 510 - r)
+    return np.char.add(f"{alpha:02x}", _GRADIENT_BGR[code])
+
+MEAS_FIELDS = ['SYSTEM','PLMN','xNBID','LOCAL_CID','PCI/PSC/BSIC','ARFCN','BAND','RSSI','RSRP/RSCP','RSRQ/ECIO','SNR','DATE','TIME']
+
+# Style cutoffs: a value <= cut[i] (and > cut[i-1]) gets _STYLE_IDS[i]
+_STYLE_IDS = np.array([sid for sid, _ in STYLE_TABLE])
+_RSRP_CUT = np.array([-115, -105, -95, -90, -85], dtype=float)
+_RSSI_CUT = np.array([-110, -100, -90, -80, -70], dtype=float)
+
+def style_for_values(metric, vals: np.ndarray) -> np.ndarray:
+    # style ids for arrays of values; metric is one name or an array of names
+    rsrp = np.char.upper(np.asarray(metric, dtype=str)) == 'RSRP'
+    pos = np.where(rsrp, np.searchsorted(_RSRP_CUT, vals, side='left'),
+                   np.searchsorted(_RSSI_CUT, vals, side='left'))
+    return _STYLE_IDS[pos]
 
 # ----------------- Prediction -----------------
-def idw_predict_weighted(lat, lon, pts, neighbors=12, power=2.0, same_boost=2.0, mismatch_penalty=0.6):
-    # pts: [(lat, lon, value, xnbid, pci, metric_name)]
-    if not pts:
-        return None, None
-    dists = [(haversine(lat, lon, la, lo), v, xid, pci, m) for la, lo, v, xid, pci, m in pts]
-    dists.sort(key=lambda x: x[0])
-    used = dists[:neighbors]
-    if not used:
-        return None, None
-    # snap to nearest if very close
-    if used[0][0] < 5.0:
-        return used[0][1], used[0][4]
-    # drop if too far from any point (avoid hallucinating islands)
-    if used[0][0] > 2000.0:
-        return None, None
-    num = 0.0
-    den = 0.0
+METRICS = ('RSRP', 'RSSI')
+
+def _id_codes(col: Optional[pd.Series], n: int) -> np.ndarray:
+    # cell identities as int64, -1 where missing (never matches anything)
+    if col is None:
+        return np.full(n, -1, dtype=np.int64)
+    v = pd.to_numeric(col, errors='coerce').to_numpy(float)
+    return np.where(np.isnan(v), -1, np.trunc(v)).astype(np.int64)
+
+def _idw_weighted_numpy(Dk, idx, pv, pxid, ppci, pmet, power, same_boost, mismatch_penalty):
+    Vk = pv[idx]
     # Use closest point's identity as a proxy for serving cell
-    ref_xid, ref_pci = used[0][2], used[0][3]
+    Xk = pxid[idx]; Pk = ppci[idx]
+    same = ((Xk >= 0) & (Xk == Xk[:, :1])) | ((Pk >= 0) & (Pk == Pk[:, :1]))
+    W = 1.0 / ((Dk + 1e-6) ** power)
+    W *= np.where(same, same_boost, mismatch_penalty)
+    pred = (W * Vk).sum(1) / W.sum(1)
+    # snap to nearest if very close
+    snap = Dk[:, 0] < 5.0
+    pred[snap] = Vk[snap, 0]
     # Use its metric type to choose color scale
-    metric_used = used[0][4] if used[0][4] is not None else 'RSRP'
-    for d, v, xid, pci, m in used:
-        w = 1.0 / ((d + 1e-6) ** power)
-        if (xid is not None and xid == ref_xid) or (pci is not None and pci == ref_pci):
-            w *= same_boost
-        else:
-            w *= mismatch_penalty
-        num += w * v
-        den += w
-    return (num / den if den > 0 else None), metric_used
+    return pred, pmet[idx[:, 0]]
+
+if HAVE_NUMBA:
+    # cache=True keeps the compiled kernel on disk (__pycache__), so only the
+    # first run on a machine pays the JIT compile cost
+    @njit(cache=True, fastmath=True, parallel=True, boundscheck=False, nogil=True)
+    def idw_grid(Dk, idx, pv, pxid, ppci, pmet, power, same_boost, mismatch_penalty,
+                 out_pred, out_metric):
+        M, k = Dk.shape
+        for i in prange(M):
+            near = idx[i, 0]
+            if Dk[i, 0] < 5.0:
+                out_pred[i] = pv[near]; out_metric[i] = pmet[near]
+                continue
+            ref_xid = pxid[near]; ref_pci = ppci[near]
+            num = 0.0; den = 0.0
+            for q in range(k):
+                j = idx[i, q]
+                w = 1.0 / ((Dk[i, q] + 1e-6) ** power)
+                if (pxid[j] >= 0 and pxid[j] == ref_xid) or (ppci[j] >= 0 and ppci[j] == ref_pci):
+                    w *= same_boost
+                else:
+                    w *= mismatch_penalty
+                num += w * pv[j]
+                den += w
+            out_pred[i] = num / den
+            out_metric[i] = pmet[near]
+
+def idw_predict_weighted_grid(lat, lon, pla, plo, pv, pxid, ppci, pmet, neighbors=12, power=2.0,
+                              same_boost=2.0, mismatch_penalty=0.6, workers=-1, max_range=2000.0):
+    # IDW for all tiles at once: k-d tree neighbor search, then the weighted
+    # combine (Numba kernel when available, NumPy otherwise).
+    # Returns (pred, metric): pred is NaN where no prediction, metric indexes METRICS
+    M = lat.shape[0]
+    pred = np.full(M, np.nan)
+    metric = np.full(M, -1, dtype=np.int64)
+    k = min(neighbors, pla.shape[0])
+    if k == 0:
+        return pred, metric
+    lat0 = 0.5 * (pla.min() + pla.max()); lon0 = 0.5 * (plo.min() + plo.max())
+    tree = cKDTree(project_xy(pla, plo, lat0, lon0))
+    xy = project_xy(lat, lon, lat0, lon0)
+    # The grid spans a few km, so flat-earth distances in the projected plane
+    # are within a fraction of a percent of haversine and need no trig per pair.
+    # Queries run on `workers` threads (-1 = all cores).
+    # Drop tiles too far from any point (avoid hallucinating islands): a cheap
+    # bounded nearest-point pass culls them before the full k-NN.
+    d1, _ = tree.query(xy, k=1, distance_upper_bound=max_range, workers=workers)
+    alive = np.isfinite(d1)
+    Dk, idx = tree.query(xy[alive], k=k, workers=workers)
+    Dk = Dk.reshape(-1, k); idx = idx.reshape(-1, k)
+    if not HAVE_NUMBA:
+        pred[alive], metric[alive] = _idw_weighted_numpy(Dk, idx, pv, pxid, ppci, pmet, power,
+                                                         same_boost, mismatch_penalty)
+        return pred, metric
+    if workers > 0:
+        set_num_threads(min(workers, numba_config.NUMBA_NUM_THREADS))
+    out_pred = np.empty(Dk.shape[0])
+    out_metric = np.empty(Dk.shape[0], dtype=np.int64)
+    idw_grid(Dk, idx, pv, pxid, ppci, pmet, float(power),
+             float(same_boost), float(mismatch_penalty), out_pred, out_metric)
+    pred[alive] = out_pred; metric[alive] = out_metric
+    return pred, metric
 
 # ----------------- Metric selection -----------------
-def choose_metric(row, prefer: str):
-    try:
-        if prefer == 'RSRP':
-            v = row.get('RSRP/RSCP')
-            return ('RSRP', float(v)) if pd.notna(v) else None
-        elif prefer == 'RSSI':
-            v = row.get('RSSI')
-            return ('RSSI', float(v)) if pd.notna(v) else None
-        else:
-            sys = int(row.get('SYSTEM')) if pd.notna(row.get('SYSTEM')) else None
-            if sys in (4, 7):
-                v = row.get('RSRP/RSCP')
-                if pd.notna(v):
-                    return ('RSRP', float(v))
-            v = row.get('RSSI')
-            return ('RSSI', float(v)) if pd.notna(v) else None
-    except Exception:
-        return None
+def _numeric_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors='coerce').to_numpy(float)
+
+def choose_metric(df: pd.DataFrame, prefer: str):
+    # per-row (metric name, value) arrays; value is NaN where the row has no usable metric
+    rsrp = _numeric_col(df, 'RSRP/RSCP')
+    rssi = _numeric_col(df, 'RSSI')
+    if prefer == 'RSRP':
+        return np.full(len(df), 'RSRP'), rsrp
+    elif prefer == 'RSSI':
+        return np.full(len(df), 'RSSI'), rssi
+    use_rsrp = np.isin(_numeric_col(df, 'SYSTEM'), (4, 7)) & ~np.isnan(rsrp)
+    return np.where(use_rsrp, 'RSRP', 'RSSI'), np.where(use_rsrp, rsrp, rssi)
+
+def _id_strings(col: pd.Series) -> List[Optional[str]]:
+    out = []
+    for v in col.tolist():
+        if pd.isna(v):
+            out.append(None)
+            continue
+        try: out.append(str(int(v)))
+        except: out.append(str(v))
+    return out
 
 # ----------------- Main -----------------
 def main():
@@ -205,12 +350,13 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--measurements', required=True)
     ap.add_argument('--antennas', required=False)
-    ap.add_argument('--out', required=True)
+    ap.add_argument('--out', required=True, help='Output .kml (or .kmz for a zipped KML)')
     ap.add_argument('--metric', default='auto', choices=['auto','RSRP','RSSI'])
     ap.add_argument('--grid_step_deg', type=float, default=0.0005)
     ap.add_argument('--idw_neighbors', type=int, default=12)
     ap.add_argument('--idw_power', type=float, default=2.0)
     ap.add_argument('--tile_alpha', type=int, default=160)
+    ap.add_argument('--jobs', type=int, default=-1, help='Worker threads for the IDW grid (-1 = all cores)')
     ap.add_argument('--hide_points', action='store_true', help='Hide measurement points folder in KML')
     ap.add_argument('--no_points', action='store_true', help='Do not include measurement points in the KML at all')
     # Optional filters to improve accuracy
@@ -219,6 +365,8 @@ def main():
     ap.add_argument('--date_from', type=str, default=None)
     ap.add_argument('--date_to', type=str, default=None)
     args = ap.parse_args()
+    if args.jobs != -1 and args.jobs < 1:
+        ap.error('--jobs must be -1 (all cores) or >= 1')
 
     df = _read_measurements_auto(args.measurements)
     if 'LAT' not in df.columns or 'LON' not in df.columns:
@@ -236,32 +384,23 @@ def main():
     if args.date_to is not None and 'DATE' in df.columns:
         df = df[df['DATE'] <= args.date_to]
 
-    placemarks = []
-    meas_pts = []  # (lat, lon, value, xnbid, pci, metric_name)
-    for i, row in df.iterrows():
-        lat = row['LAT']; lon = row['LON']
-        if pd.isna(lat) or pd.isna(lon):
-            continue
-        mv = choose_metric(row, args.metric)
-        if mv is None:
-            continue
-        metric_name, value = mv
-        # style for the measurement point icon
-        sid = style_for_value(metric_name, value)
-        fields = ['SYSTEM','PLMN','xNBID','LOCAL_CID','PCI/PSC/BSIC','ARFCN','BAND','RSSI','RSRP/RSCP','RSRQ/ECIO','SNR','DATE','TIME']
-        desc = '<br/>'.join([f'<b>{k}</b>: {row.get(k)}' for k in fields if k in df.columns])
-        name_parts = []
-        if 'xNBID' in df.columns and pd.notna(row.get('xNBID')):
-            try: name_parts.append(str(int(row.get('xNBID'))))
-            except: name_parts.append(str(row.get('xNBID')))
-        if 'LOCAL_CID' in df.columns and pd.notna(row.get('LOCAL_CID')):
-            try: name_parts.append(str(int(row.get('LOCAL_CID'))))
-            except: name_parts.append(str(row.get('LOCAL_CID')))
-        name = '-'.join(name_parts) if name_parts else f'Meas {i}'
-        placemarks.append(kml_point(name, float(lat), float(lon), desc, sid))
-        xid = row.get('xNBID') if 'xNBID' in df.columns else None
-        pci = row.get('PCI/PSC/BSIC') if 'PCI/PSC/BSIC' in df.columns else None
-        meas_pts.append((float(lat), float(lon), float(value), xid, pci, metric_name))
+    lat_arr = df['LAT'].to_numpy(float); lon_arr = df['LON'].to_numpy(float)
+    metric_arr, value_arr = choose_metric(df, args.metric)
+    valid = ~np.isnan(lat_arr) & ~np.isnan(lon_arr) & ~np.isnan(value_arr)
+    meas = df[valid]
+    pla, plo, pv = lat_arr[valid], lon_arr[valid], value_arr[valid]
+    metric_arr = metric_arr[valid]
+    # style for the measurement point icon
+    sids = style_for_values(metric_arr, pv)
+    fields = [k for k in MEAS_FIELDS if k in df.columns]
+    cols = [meas[k].tolist() for k in fields]
+    descs = ['<br/>'.join([f'<b>{k}</b>: {v}' for k, v in zip(fields, vals)]) for vals in zip(*cols)] if cols else [''] * len(meas)
+    name_cols = [_id_strings(meas[c]) for c in ('xNBID', 'LOCAL_CID') if c in df.columns]
+    names = ['-'.join([p for p in parts if p is not None]) or f'Meas {i}' for i, *parts in zip(meas.index, *name_cols)]
+    placemarks = [kml_point(n, la, lo, d, sid) for n, la, lo, d, sid in zip(names, pla.tolist(), plo.tolist(), descs, sids.tolist())]
+    pxid = _id_codes(meas['xNBID'] if 'xNBID' in df.columns else None, len(meas))
+    ppci = _id_codes(meas['PCI/PSC/BSIC'] if 'PCI/PSC/BSIC' in df.columns else None, len(meas))
+    pmet = (metric_arr == 'RSSI').astype(np.int64)  # index into METRICS
 
     # ---- antennas ----
     antenna_placemarks = []
@@ -271,62 +410,61 @@ def main():
         latc = colmap.get('lat'); lonc = colmap.get('lon')
         namec = colmap.get('name', None)
         if latc and lonc:
-            for _, r in adf.iterrows():
+            names = adf[namec].tolist() if namec else [None] * len(adf)
+            ids = adf[colmap['id']].tolist() if 'id' in colmap else [None] * len(adf)
+            for raw_lat, raw_lon, nm, aid in zip(adf[latc].tolist(), adf[lonc].tolist(), names, ids):
                 try:
-                    alat = float(r[latc]); alon = float(r[lonc])
+                    alat = float(raw_lat); alon = float(raw_lon)
                 except Exception:
                     continue
-                nm = str(r[namec]) if namec and pd.notna(r[namec]) else 'Antenna'
-                desc = ''
-                if 'id' in colmap and pd.notna(r[colmap['id']]):
-                    desc = 'ID: {}'.format(r[colmap['id']])
+                nm = str(nm) if pd.notna(nm) else 'Antenna'
+                desc = 'ID: {}'.format(aid) if pd.notna(aid) else ''
                 antenna_placemarks.append(kml_point(nm, alat, alon, desc, 'antenna'))
 
     # ---- grid bounds ----
-    if meas_pts:
-        lats = [p[0] for p in meas_pts]; lons = [p[1] for p in meas_pts]
-        lat_min, lat_max = min(lats)-0.002, max(lats)+0.002
-        lon_min, lon_max = min(lons)-0.002, max(lons)+0.002
+    if pv.size:
+        lat_min, lat_max = pla.min()-0.002, pla.max()+0.002
+        lon_min, lon_max = plo.min()-0.002, plo.max()+0.002
     else:
         lat_min = lon_min = 0; lat_max = lon_max = 0
 
     # ---- prediction tiles ----
-    tiles = []
-    if meas_pts:
-        step = args.grid_step_deg
-        lat = lat_min
-        while lat <= lat_max:
-            lon = lon_min
-            while lon <= lon_max:
-                pred, metric_used = idw_predict_weighted(lat, lon, meas_pts, neighbors=args.idw_neighbors, power=args.idw_power)
-                if pred is not None:
-                    fill_color = continuous_tile_color(pred, metric_used or 'RSRP', alpha=int(args.tile_alpha))
-                    tiles.append(kml_tile_polygon(lat, lon, lat+step, lon+step, fill_color))
-                lon += step
-            lat += step
+    step = args.grid_step_deg
+    tile_lat = tile_lon = np.empty(0)
+    tile_colors = []
+    if pv.size:
+        lats_grid = grid_axis(lat_min, lat_max, step)
+        lons_grid = grid_axis(lon_min, lon_max, step)
+        LA, LO = np.meshgrid(lats_grid, lons_grid, indexing='ij')
+        LA = LA.ravel(); LO = LO.ravel()
+        pred, metric = idw_predict_weighted_grid(LA, LO, pla, plo, pv, pxid, ppci, pmet,
+                                                 neighbors=args.idw_neighbors, power=args.idw_power,
+                                                 workers=args.jobs)
+        keep = ~np.isnan(pred)
+        tile_lat, tile_lon = LA[keep], LO[keep]
+        tile_colors = continuous_tile_colors(pred[keep], metric[keep], alpha=int(args.tile_alpha)).tolist()
 
     name = 'Coverage map (GMoN-like points + smooth IDW tiles)'
-    kml_parts = [kml_header(name)]
-    kml_parts.append('    <Folder><name>Prediction (IDW tiles)</name>\n')
-    kml_parts.extend(tiles)
-    kml_parts.append('    </Folder>\n')
-
-    # Measurements (optional)
-    if not args.no_points:
-        if args.hide_points:
-            kml_parts.append('    <Folder><name>Measurements</name><visibility>0</visibility>\n')
-        else:
-            kml_parts.append('    <Folder><name>Measurements</name>\n')
-        kml_parts.extend(placemarks)
-        kml_parts.append('    </Folder>\n')
-
-    kml_parts.append('    <Folder><name>Antennas</name>\n')
-    kml_parts.extend(antenna_placemarks)
-    kml_parts.append('    </Folder>\n')
-    kml_parts.append(kml_footer())
-
-    Path(args.out).write_text(''.join(kml_parts), encoding='utf-8')
-    print(f'Wrote KML → {args.out}')
+    with open_kml(args.out) as f:
+        f.write(kml_header(name))
+        f.write('    <Folder><name>Prediction (IDW tiles)</name>\n')
+        write_tiles(f, tile_lat, tile_lon, step, tile_colors)
+        f.write('    </Folder>\n')
+
+        # Measurements (optional)
+        if not args.no_points:
+            if args.hide_points:
+                f.write('    <Folder><name>Measurements</name><visibility>0</visibility>\n')
+            else:
+                f.write('    <Folder><name>Measurements</name>\n')
+            f.write(''.join(placemarks))
+            f.write('    </Folder>\n')
+
+        f.write('    <Folder><name>Antennas</name>\n')
+        f.write(''.join(antenna_placemarks))
+        f.write('    </Folder>\n')
+        f.write(kml_footer())
+    report_written(args.out)
 
 if __name__ == '__main__':
     main()